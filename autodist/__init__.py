@@ -12,15 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import os
 import sys
+import types
 
-from tensorflow import version
-from tensorflow.python.ops import control_flow_v2_toggles
-
-from .autodist import AutoDist
 from .const import ENV
-from .patch import PatchTensorFlow
 from .utils import logging
 
 logging.set_verbosity(ENV.AUTODIST_MIN_LOG_LEVEL.val)
@@ -31,20 +28,75 @@ if sys.argv and os.path.exists(sys.argv[0]) and not os.path.isabs(sys.argv[0]):
                   'Now exit.'.format(sys.argv[0]))
     sys.exit(1)
 
-# Runtime compatibility checking
-COMPAT_TF_VERSIONS = [1.15, 2.2]
-float_major_minor_tf_version = float(version.VERSION[:version.VERSION.rfind('.')])
-if not COMPAT_TF_VERSIONS[0] <= float_major_minor_tf_version <= COMPAT_TF_VERSIONS[1]:
-    logging.error('AutoDist is only compatible with `tensorflow-gpu>={}, <={}`, but the current version is {}'.format(
-        COMPAT_TF_VERSIONS[0], COMPAT_TF_VERSIONS[1],
-        float_major_minor_tf_version
-    ))
-    sys.exit(1)
-logging.debug('AutoDist is now running on TensorFlow {}'.format(version.VERSION))
+# TensorFlow is only imported and configured at the first use of `AutoDist`,
+# so that the modules not depending on it (e.g. `const` or `utils.network`) can be imported fast.
+COMPAT_TF_VERSIONS = [(1, 15), (2, 2)]
+
+
+def _parse_major_minor_version(version):
+    """
+    Parse the major and minor numbers out of a version string.
+
+    They are compared as a tuple of ints, as e.g. 2.10 would be less than 2.2 as a float.
+
+    Args:
+        version (str): version string, e.g. '2.2.0-rc1'
+
+    Returns:
+        tuple: (major, minor) e.g. (2, 2)
+    """
+    return tuple(int(v) for v in version.split('.')[:2])
+
+
+def _is_compatible_tf_version(major_minor):
+    """Whether a (major, minor) TensorFlow version is in the range of `COMPAT_TF_VERSIONS`."""
+    return COMPAT_TF_VERSIONS[0] <= major_minor <= COMPAT_TF_VERSIONS[1]
+
+
+@functools.lru_cache(maxsize=1)
+def _ensure_tf_configured():
+    """
+    Check and configure the runtime TensorFlow, only once.
+
+    Returns:
+        tuple: (major, minor) version of the runtime TensorFlow
+    """
+    # pylint: disable=import-outside-toplevel
+    from tensorflow import version
+    from tensorflow.python.ops import control_flow_v2_toggles
+    from .patch import PatchTensorFlow
+
+    # Runtime compatibility checking
+    major_minor_tf_version = _parse_major_minor_version(version.VERSION)
+    if not _is_compatible_tf_version(major_minor_tf_version):
+        logging.error('AutoDist is only compatible with `tensorflow-gpu>={}, <={}`, but the current version is {}'
+                      .format(*('.'.join(map(str, v)) for v in COMPAT_TF_VERSIONS), version.VERSION))
+        sys.exit(1)
+    logging.debug('AutoDist is now running on TensorFlow {}'.format(version.VERSION))
+
+    # Disable tensorflow control flow version 2 (which AutoDist does not support as of now).
+    # Use control flow version 1 instead.
+    control_flow_v2_toggles.disable_control_flow_v2()
+    logging.warning('AutoDist has disabled TensorFlow control_flow_v2 in favor of control_flow_v1')
+
+    PatchTensorFlow.patch_optimizers()
+    return major_minor_tf_version
+
+
+class _AutoDistModule(types.ModuleType):
+    """
+    Resolve `AutoDist` at its first access.
+
+    A `__getattr__` on the module class rather than on the module (PEP 562), which needs Python 3.7.
+    """
+
+    def __getattr__(self, name):
+        if name == 'AutoDist':
+            _ensure_tf_configured()
+            # pylint: disable=import-outside-toplevel
+            from .autodist import AutoDist
+            return AutoDist
+        raise AttributeError('module {!r} has no attribute {!r}'.format(self.__name__, name))
 
-# Disable tensorflow control flow version 2 (which AutoDist does not support as of now).
-# Use control flow version 1 instead.
-control_flow_v2_toggles.disable_control_flow_v2()
-logging.warning('AutoDist has disabled TensorFlow control_flow_v2 in favor of control_flow_v1')
 
-PatchTensorFlow.patch_optimizers()
+sys.modules[__name__].__class__ = _AutoDistModule
@@ -23,6 +23,7 @@ from tensorflow.python.framework import ops
 from tensorflow.python.ops import array_ops
 from tensorflow.python.util import tf_contextlib
 
+from autodist import _ensure_tf_configured
 from autodist.cluster import Cluster, SSHCluster
 from autodist.const import ENV
 from autodist.coordinator import Coordinator
@@ -65,6 +66,7 @@ class _AutoDistInterface:
     """
 
     def __init__(self, resource_spec_file, strategy_builder=None):
+        _ensure_tf_configured()
         set_default_autodist(self)
         self._resource_spec = ResourceSpec(resource_file=resource_spec_file)
         self._strategy_builder = strategy_builder or PSLoadBalancing()
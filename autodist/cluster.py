@@ -31,13 +31,18 @@ Prerequisites:
 """
 import atexit
 import contextlib
+import io
 import json
 import os
+import shlex
 import signal
+import stat
 import subprocess
 import sys
+import threading
 import warnings
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 
 import paramiko
 
@@ -48,51 +53,63 @@ from autodist.utils import logging
 warnings.filterwarnings(action='ignore', module=paramiko.__name__)
 
 
+# pylint: disable=too-many-instance-attributes
 class Cluster(metaclass=ABCMeta):
     """Cluster manager for TensorFlow servers."""
 
     def __init__(self, resource_spec: ResourceSpec):
         self.cluster_spec = self._get_default_cluster_spec(resource_spec)
+        # Serialized once and shared by every node, local or remote.
+        self._cluster_spec_blob = json.dumps(self.cluster_spec).encode()
         self._cpu_devices = self._get_node_cpu_devices(resource_spec)
         self._gpu_devices = self._get_node_gpu_devices(resource_spec)
         self._chief = resource_spec.chief
         self._full_addresses = [full_address for tasks in self.cluster_spec.values() for full_address in tasks]
-        # noinspection PyTypeChecker
-        self._address_to_port = dict(a.split(':') for a in self._full_addresses)
+        # Split at the last colon, as an IPv6 address contains colons itself
+        self._address_to_port = {ip: port for ip, _, port in (a.rpartition(':') for a in self._full_addresses)}
         self._task_to_address = {
-            (job_name, task_index): a.split(':')[0]
+            (job_name, task_index): a.rpartition(':')[0]
             for job_name, tasks in self.cluster_spec.items()
             for task_index, a in enumerate(tasks)
         }
+        # If labelled as AUTODIST_WORKER by the environment variable,
+        # the value of it is the address of the local node;
+        # otherwise the local node is chief.
+        self._local_address = ENV.AUTODIST_WORKER.val or self._chief
+        self._local_task_index = next(
+            i for i, a in enumerate(self._full_addresses) if a.rpartition(':')[0] == self._local_address
+        )
+        self._local_port = self._address_to_port[self._local_address]
         self.subprocesses = []
-        logging.info('ClusterSpec: {}'.format(self.cluster_spec))
+        self._subprocesses_lock = threading.Lock()
+        logging.info('ClusterSpec: %s', self.cluster_spec)
 
     @staticmethod
     def _get_default_cluster_spec(resource_spec: ResourceSpec):
         """Create list of workers from the resource spec with semi-arbitrarily chosen ports."""
-        return {
-            'worker': [
-                '{ip}:{port}'.format(
-                    ip=n,
-                    port=next(DEFAULT_PORT_RANGE)
-                    # sorted is important.
-                    # we need to guarantee the ip-port mapping to be the same in every worker.
-                ) for n in sorted(resource_spec.nodes)
-            ]
-        }
+        workers = []
+        # sorted is important.
+        # we need to guarantee the ip-port mapping to be the same in every worker.
+        for n in sorted(resource_spec.nodes):
+            # The ports are drawn eagerly here, exactly once per node.
+            workers.append('{ip}:{port}'.format(ip=n, port=next(DEFAULT_PORT_RANGE)))
+        return {'worker': workers}
 
     @staticmethod
     def _get_node_cpu_devices(resource_spec: ResourceSpec):
         _cpu_devices = dict()
         for device in resource_spec.cpu_devices:
-            _cpu_devices.setdefault(device[0].split(':')[0], []).append(':'.join(device[0].split(':')[1:]))
+            # Split at the last two colons, as an IPv6 host address contains colons itself
+            host_address, device_type, device_index = device[0].rsplit(':', 2)
+            _cpu_devices.setdefault(host_address, []).append(device_type + ':' + device_index)
         return _cpu_devices
 
     @staticmethod
     def _get_node_gpu_devices(resource_spec: ResourceSpec):
         _gpu_devices = dict()
         for device in resource_spec.gpu_devices:
-            _gpu_devices.setdefault(device[0].split(':')[0], []).append(':'.join(device[0].split(':')[1:]))
+            host_address, device_type, device_index = device[0].rsplit(':', 2)
+            _gpu_devices.setdefault(host_address, []).append(device_type + ':' + device_index)
         return _gpu_devices
 
     def is_chief(self, address=None):
@@ -108,7 +125,7 @@ class Cluster(metaclass=ABCMeta):
         Returns:
             bool: Whether address or self is chief
         """
-        address = address or self.get_local_address()
+        address = address or self._local_address
         return address == self._chief
 
     def get_address_from_task(self, job_name, task_index):
@@ -135,7 +152,7 @@ class Cluster(metaclass=ABCMeta):
         Returns:
             str: Worker ip or chief address by default.
         """
-        return ENV.AUTODIST_WORKER.val or self._chief
+        return self._local_address
 
     def get_local_worker_task_index(self):
         """
@@ -144,7 +161,7 @@ class Cluster(metaclass=ABCMeta):
         Returns:
             int: Task index
         """
-        return [i for i, a in enumerate(self._full_addresses) if self.get_local_address() in a][0]
+        return self._local_task_index
 
     def get_local_session_target(self):
         """
@@ -153,19 +170,14 @@ class Cluster(metaclass=ABCMeta):
         Returns:
             str: Local session target
         """
-        port = self._address_to_port[self.get_local_address()]
-        return 'grpc://localhost:' + port
+        return 'grpc://localhost:' + self._local_port
 
-    # pylint: disable=too-many-locals
     def start(self):
         """
         Start tf.servers on all nodes.
 
         Note that this only runs (and only should run) on the chief node.
         """
-        # pylint: disable=import-outside-toplevel
-        from autodist.utils import server_starter
-
         # atexit registration should be placed
         #   - before the beginning of the start
         #   (to ensure the clean termination if the start fails in its half way); and
@@ -174,40 +186,83 @@ class Cluster(metaclass=ABCMeta):
         #   lower level modules will normally be imported
         #   before higher level modules and thus must be cleaned up later).
         atexit.register(self.terminate)
+
+        tasks = [
+            (job_name, task_index, full_address)
+            for job_name, job_tasks in self.cluster_spec.items()
+            for task_index, full_address in enumerate(job_tasks)
+        ]
+
+        if any(self.is_chief(address) for address in self._task_to_address.values()):
+            # Read by the local server starter. The working directory is shared by all the runs on this node,
+            # so write to a temporary file and rename it, for a starting server never to read a partial file.
+            path = os.path.join(DEFAULT_WORKING_DIR, 'cluster_spec.json')
+            tmp_path = '{}.{}'.format(path, os.getpid())
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(self._cluster_spec_blob)
+                os.replace(tmp_path, path)
+            except OSError:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+                raise
+
+        # pylint: disable=import-outside-toplevel
+        from autodist.utils import server_starter
+
+        # Launch the servers concurrently so that the SSH round trips to different nodes overlap.
+        # Safe from threads, as no launch uses `preexec_fn` (see `_launch_one` and `remote_exec`).
+        with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            # Consume the results to re-raise any exception from the launching threads.
+            list(executor.map(
+                lambda task: self._launch_one(*task, server_starter.__name__, server_starter.__file__), tasks
+            ))
+
+    def _launch_one(self, job_name, task_index, full_address, starter_module, starter_file):
+        """
+        Start the tf.server of a single task.
+
+        Args:
+            job_name (str): TensorFlow job name
+            task_index (int): TensorFlow task index
+            full_address (str): address of the task, e.g. ip:port
+            starter_module (str): module name of the server starter, run by a local server
+            starter_file (str): local file path of the server starter, copied to a remote server
+
+        Returns:
+            Process: process handle
+        """
         envs = {ENV.AUTODIST_MIN_LOG_LEVEL.name: 'ERROR'}
-        envs = ['{}={}'.format(k, v) for k, v in envs.items()]
-        module_name = server_starter.__name__
-        module_file = server_starter.__file__
-
-        for job_name, tasks in self.cluster_spec.items():
-            for task_index, full_address in enumerate(tasks):
-                address = full_address.split(':')[0]
-                args = ['--job_name=%s' % job_name, '--task_index=%d' % task_index,
-                        '--cpu_device_num=%d' % len(self._cpu_devices[address])]
-                if address in self._gpu_devices:
-                    envs_cuda = []
-                else:
-                    envs_cuda = ['CUDA_VISIBLE_DEVICES=""']
-                if self.is_chief(address):
-                    json.dump(self.cluster_spec, open(os.path.join(DEFAULT_WORKING_DIR, 'cluster_spec.json'), 'w+'))
-                    cmd = envs + envs_cuda + [sys.executable, '-m', module_name] + args
-                    # pylint: disable=subprocess-popen-preexec-fn
-                    proc = subprocess.Popen(' '.join(cmd), shell=True, preexec_fn=os.setsid)
-                    self.subprocesses.append(proc)
-                    # The above line immediately follows the Popen
-                    # to ensure no gap for termination failure due to the empty proc list.
-                    logging.debug('$ local tf.server started at {}: job_name={} task_index={}'.format(
-                        full_address, job_name, task_index
-                    ))
-                else:  # remote
-                    self.remote_pre_start_tf_server(address, tf_server_starter_filepath=module_file)
-                    file = os.path.join(DEFAULT_WORKING_DIR, os.path.basename(module_file))
-                    bash = envs + envs_cuda + ['python', '-u', file] + args
-                    logging.info("Launching tf.server on %s" % address)
-                    proc = self.remote_exec(bash, hostname=address)
-                    # The above line immediately follows the Popen
-                    # to ensure no gap for termination failure due to the empty proc list.
-                    self.subprocesses.append(proc)
+        address = full_address.rpartition(':')[0]
+        if address not in self._gpu_devices:
+            envs['CUDA_VISIBLE_DEVICES'] = ''
+        args = ['--job_name=%s' % job_name, '--task_index=%d' % task_index,
+                '--cpu_device_num=%d' % len(self._cpu_devices[address])]
+        if self.is_chief(address):
+            # A fresh interpreter rather than a fork of the chief, which has TensorFlow loaded and maybe initialized;
+            # its command line is also what `server_starter` looks for when cleaning up stale servers.
+            # `start_new_session` rather than `preexec_fn=os.setsid`, which is unsafe with threads
+            # (the servers are launched from a thread pool).
+            cmd = [sys.executable, '-m', starter_module] + args
+            proc = subprocess.Popen(cmd, env=dict(os.environ, **envs), start_new_session=True)
+            with self._subprocesses_lock:
+                self.subprocesses.append(proc)
+            # The above line immediately follows the Popen
+            # to ensure no gap for termination failure due to the empty proc list.
+            logging.debug('$ local tf.server started at %s: job_name=%s task_index=%d',
+                          full_address, job_name, task_index)
+        else:  # remote
+            self.remote_pre_start_tf_server(address, tf_server_starter_filepath=starter_file)
+            file = os.path.join(DEFAULT_WORKING_DIR, os.path.basename(starter_file))
+            envs = ['{}={}'.format(k, v) for k, v in envs.items()]
+            bash = envs + ['python', '-u', file] + args
+            logging.info("Launching tf.server on %s", address)
+            proc = self.remote_exec(bash, hostname=address)
+            # The below line immediately follows the Popen
+            # to ensure no gap for termination failure due to the empty proc list.
+            with self._subprocesses_lock:
+                self.subprocesses.append(proc)
+        return proc
 
     def terminate(self):
         """Terminate."""
@@ -224,11 +279,11 @@ class Cluster(metaclass=ABCMeta):
             tf_server_starter_filepath (str): local starter file path
             working_dir (str): remote working directory
         """
-        logging.info("Copying necessary files to %s" % hostname)
+        logging.info("Copying necessary files to %s", hostname)
         self.remote_copy(local_path=tf_server_starter_filepath, remote_path=working_dir, hostname=hostname)
         self.remote_file_write(
             remote_path=os.path.join(working_dir, 'cluster_spec.json'),
-            data=json.dumps(self.cluster_spec),
+            data=self._cluster_spec_blob,
             hostname=hostname,
         )
 
@@ -252,7 +307,7 @@ class Cluster(metaclass=ABCMeta):
 
         Args:
             remote_path (str): remote file path
-            data (str): data to be written
+            data (bytes): data to be written
             hostname (str): host name or address
         """
 
@@ -273,45 +328,55 @@ class SSHCluster(Cluster):
 
     def __init__(self, resource_spec):
         self._ssh_conf = resource_spec.ssh_config_map
+        # Multiplex the ssh sessions to a node over a single connection, so that only the first one handshakes.
+        # The socket is private to this process, so that exiting the master never hangs up another run's sessions.
+        self._ssh_control_path = '~/.ssh/autodist-{}-%C'.format(os.getpid())
+        self._ssh_masters = set()
+        # Connections are opened lazily and kept open for the lifetime of the cluster,
+        # so that every operation on a node shares a single SSH handshake.
+        self._clients = {}
+        self._client_locks = {}
+        # (hostname, remote directory) pairs known to exist
+        self._mkdir_done = set()
         super().__init__(resource_spec)
 
-    @contextlib.contextmanager
-    def _get_ssh_client(self, hostname):
+    def _get_or_open(self, hostname):
         """
-        Get a Paramiko SSH Client to the given node.
+        Get the cached Paramiko SSH and SFTP clients to the given node, connecting on the first call.
 
         Args:
-            hostname (str): The node to SSH into.
+            hostname (str): The node to connect to.
 
         Returns:
-            Yields a Paramiko SSHClient.
+            tuple: A Paramiko SSHClient and an SFTPClient over the same transport.
         """
-        ssh_config = self._ssh_conf[hostname]
-        client = paramiko.SSHClient()
-        client.load_system_host_keys()
-        client.set_missing_host_key_policy(paramiko.WarningPolicy)
-        client.connect(hostname=hostname, port=ssh_config.port, username=ssh_config.username, pkey=ssh_config.pkey)
-        yield client
-        client.close()
-
-    @contextlib.contextmanager
-    def _get_sftp_client(self, hostname):
-        """
-        Get a Paramiko SFTP Client to the given node.
-
-        Args:
-            hostname (str): The node to SFTP to.
+        # One lock per node so that connections to different nodes can still be opened concurrently.
+        with self._client_locks.setdefault(hostname, threading.Lock()):
+            if hostname not in self._clients:
+                ssh_config = self._ssh_conf[hostname]
+                client = paramiko.SSHClient()
+                client.load_system_host_keys()
+                client.set_missing_host_key_policy(paramiko.WarningPolicy)
+                client.connect(hostname=hostname, port=ssh_config.port, username=ssh_config.username,
+                               pkey=ssh_config.pkey)
+                self._clients[hostname] = (client, client.open_sftp())
+            return self._clients[hostname]
 
-        Returns:
-            Yields a Paramiko SFTPClient.
-        """
-        ssh_config = self._ssh_conf[hostname]
-        t = paramiko.Transport((hostname, ssh_config.port))
-        t.connect(username=ssh_config.username, pkey=ssh_config.pkey)
-        sftp = paramiko.SFTPClient.from_transport(t)
-        yield sftp
-        sftp.close()
-        t.close()
+    def terminate(self):
+        """Terminate and close the connections to the remote nodes."""
+        super().terminate()
+        for client, sftp in self._clients.values():
+            sftp.close()
+            client.close()
+        self._clients.clear()
+        for hostname in self._ssh_masters:
+            ssh_config = self._ssh_conf[hostname]
+            subprocess.run(
+                ['ssh', '-O', 'exit', '-o', 'ControlPath=' + self._ssh_control_path, '-p', str(ssh_config.port),
+                 '{}@{}'.format(ssh_config.username, hostname)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False
+            )
+        self._ssh_masters.clear()
 
     def remote_exec(self, args, hostname):
         """
@@ -324,24 +389,34 @@ class SSHCluster(Cluster):
         Returns:
             Process: process handle
         """
-        cmd_list = []
         ssh_config = self._ssh_conf[hostname]
+        envs = ['%s=%s' % (k, v) for k, v in ssh_config.env.items()]
+        # The remote command is the only part parsed by a shell (the remote login shell).
         if ssh_config.python_venv:
-            cmd_list.append('%s;' % ssh_config.python_venv)
-        if ssh_config.env:
-            cmd_list.extend(['%s=%s' % (k, v) for k, v in ssh_config.env.items()])
-        full_cmd = ' '.join(cmd_list + args)
-
-        remote_cmd = 'ssh -i {} -o StrictHostKeyChecking=no -tt -p {} {}@{} \'bash -c "{}"\' </dev/null' \
-            .format(ssh_config.key_file, ssh_config.port, ssh_config.username, hostname, full_cmd)
-
-        logging.debug('$ %s' % remote_cmd)
+            # Activating the venv needs a shell of its own, in which the command then runs.
+            full_cmd = ' '.join(['%s;' % ssh_config.python_venv] + envs + args)
+            remote_payload = 'bash -c {}'.format(shlex.quote(full_cmd))
+        else:
+            # Otherwise `env` sets the variables and runs the command without another shell.
+            remote_payload = ' '.join(['env'] + envs + args)
+
+        remote_cmd = [
+            'ssh', '-i', ssh_config.key_file, '-o', 'StrictHostKeyChecking=no',
+            '-o', 'ControlMaster=auto', '-o', 'ControlPath=' + self._ssh_control_path, '-o', 'ControlPersist=600',
+            '-tt', '-p', str(ssh_config.port),
+            '{}@{}'.format(ssh_config.username, hostname), remote_payload
+        ]
+
+        if logging.is_enabled_for(logging.DEBUG):
+            logging.debug('$ %s', ' '.join(shlex.quote(a) for a in remote_cmd))
 
         if ENV.AUTODIST_DEBUG_REMOTE.val:
             return None
 
-        # pylint: disable=subprocess-popen-preexec-fn
-        proc = subprocess.Popen(remote_cmd, shell=True, preexec_fn=os.setsid)
+        # `start_new_session` rather than `preexec_fn=os.setsid`, which is unsafe with threads
+        # (the servers are launched from a thread pool).
+        proc = subprocess.Popen(remote_cmd, stdin=subprocess.DEVNULL, start_new_session=True)
+        self._ssh_masters.add(hostname)
         return proc
 
     def remote_file_write(self, remote_path, data, hostname):
@@ -350,12 +425,13 @@ class SSHCluster(Cluster):
 
         Args:
             remote_path (str): remote file path
-            data (str): data to be written
+            data (bytes): data to be written
             hostname (str): host name or address
         """
-        with self._get_sftp_client(hostname) as sftp:
-            with sftp.open(remote_path, 'w') as f:
-                f.write(data)
+        _, sftp = self._get_or_open(hostname)
+        # No `confirm` stat after the upload, which would cost one more round trip;
+        # a failed write has already raised when the pipelined file is closed.
+        sftp.putfo(io.BytesIO(data), remote_path, confirm=False)
 
     def remote_copy(self, local_path, remote_path, hostname):
         """
@@ -366,9 +442,29 @@ class SSHCluster(Cluster):
             remote_path (str): remote directory path
             hostname (str): host name or address
         """
-        # Make sure directory exists
-        with self._get_ssh_client(hostname) as client:
-            _ = client.exec_command('mkdir -p %s' % remote_path)
-
-        with self._get_sftp_client(hostname) as sftp:
-            sftp.put(localpath=local_path, remotepath=os.path.join(remote_path, os.path.basename(local_path)))
+        _, sftp = self._get_or_open(hostname)
+        # Make sure directory exists, which only has to be checked once per node
+        if (hostname, remote_path) not in self._mkdir_done:
+            self._sftp_makedirs(sftp, remote_path)
+            self._mkdir_done.add((hostname, remote_path))
+        # Likewise, skip the `confirm` round trip (see `remote_file_write`).
+        sftp.put(localpath=local_path, remotepath=os.path.join(remote_path, os.path.basename(local_path)),
+                 confirm=False)
+
+    @classmethod
+    def _sftp_makedirs(cls, sftp, remote_path):
+        """Recursively create a remote directory over SFTP like `mkdir -p`."""
+        try:
+            attrs = sftp.stat(remote_path)
+        except IOError:
+            parent = os.path.dirname(remote_path.rstrip('/'))
+            if parent and parent != remote_path:
+                cls._sftp_makedirs(sftp, parent)
+            try:
+                sftp.mkdir(remote_path)
+                return
+            except IOError:
+                # Created concurrently by someone else
+                attrs = sftp.stat(remote_path)
+        if not stat.S_ISDIR(attrs.st_mode):
+            raise NotADirectoryError('Remote path {} exists but is not a directory'.format(remote_path))
@@ -28,6 +28,7 @@ from tensorflow.python.framework.importer import import_graph_def
 from tensorflow.python.ops.resource_variable_ops import _from_proto_fn
 from tensorflow.python.ops.variables import Variable
 
+from autodist import _ensure_tf_configured
 from autodist.const import COLOCATION_PREFIX
 from autodist.kernel.common import op_info
 from autodist.kernel.common.utils import parse_name_scope, get_op_name
@@ -225,6 +226,8 @@ class GraphItem:
     """
 
     def __init__(self, graph: ops.Graph = None, graph_def: GraphDef = None):
+        # The optimizers are patched there to record their info and gradients into the default GraphItem.
+        _ensure_tf_configured()
         if graph:
             self._graph = graph
         elif graph_def:
@@ -52,7 +52,7 @@ class AllReduceSynchronizer(Synchronizer):
 
     def __init__(self, config: synchronizers_pb2.AllReduceSynchronizer):
         self._spec = synchronizers_pb2.AllReduceSynchronizer.Spec.Name(config.spec)
-        if autodist.float_major_minor_tf_version < 1.15 or autodist.float_major_minor_tf_version < 2.1:
+        if autodist._ensure_tf_configured() < (2, 1):
             logging.warning('Collective synchronizer spec "{}" a.k.a communication_hint has no effect '
                             'until tensorflow-gpu 1.x>= 1.15 or 2.x>=2.1. It may cause error currently.'
                             .format(self._spec))
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 """Resource Specification."""
+import functools
 import os
 import re
 from enum import Enum
@@ -119,7 +120,7 @@ class ResourceSpec:
         """Node_address-to-device_string mapping of all gpu devices."""
         _gpu_devices = dict()
         for device in self.gpu_devices:
-            _gpu_devices.setdefault(device[0].split(':')[0], []).append(device[0])
+            _gpu_devices.setdefault(device[0].rsplit(':', 2)[0], []).append(device[0])
         return _gpu_devices
 
     @property
@@ -127,7 +128,7 @@ class ResourceSpec:
         """Node_address-to-device_string mapping of all cpu devices."""        
         _cpu_devices = dict()
         for device in self.cpu_devices:
-            _cpu_devices.setdefault(device[0].split(':')[0], []).append(device[0])
+            _cpu_devices.setdefault(device[0].rsplit(':', 2)[0], []).append(device[0])
         return _cpu_devices
 
     @property
@@ -315,4 +316,10 @@ class SSHConfigMap(dict):
     def _gen_rsa_pkey(key_file_path: str):
         if not key_file_path:
             return None
-        return paramiko.RSAKey.from_private_key_file(os.path.expanduser(os.path.abspath(key_file_path)))
+        return _load_rsa_pkey(os.path.abspath(os.path.expanduser(key_file_path)))
+
+
+@functools.lru_cache(maxsize=32)
+def _load_rsa_pkey(path: str):
+    """Parse an RSA private key file only once, however many SSH groups share it."""
+    return paramiko.RSAKey.from_private_key_file(path)
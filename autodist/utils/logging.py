@@ -27,6 +27,9 @@ import traceback as _traceback
 
 import autodist.const
 
+# For guarding the expensive debug messages with `is_enabled_for(DEBUG)`
+DEBUG = _logging.DEBUG
+
 _logger = None
 _logger_lock = threading.Lock()
 
@@ -144,3 +147,8 @@ def set_verbosity(v):
 def get_verbosity():
     """Get the verbosity of autodist logger."""
     return get_logger().getEffectiveLevel()
+
+
+def is_enabled_for(level):
+    """Whether a message at the given level would be processed by autodist logger."""
+    return get_logger().isEnabledFor(level)
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 """Network utility functions."""
+import functools
 from ipaddress import ip_address
 
 import netifaces
@@ -44,18 +45,31 @@ def is_local_address(address):
     Returns:
         Boolean
     """
-    ip = _get_ip_from_address(address)
+    return _get_ip_from_address(address) in _local_addresses()
+
+
+@functools.lru_cache(maxsize=1)
+def _local_addresses():
+    """
+    Get the IP addresses of all the local network interfaces.
 
-    # Get all addresses
+    The interfaces are only walked once, as they are not expected to change during a run.
+
+    Returns:
+        A frozenset of IPv4Address and IPv6Address objects.
+    """
     addresses = set()
     for iface_name in netifaces.interfaces():
-        for i in netifaces.ifaddresses(iface_name).setdefault(netifaces.AF_INET, [{'addr': None}]):
-            if i['addr']:
-                addresses.add(ip_address(i['addr']))
-
-    return ip in addresses
+        ifaddresses = netifaces.ifaddresses(iface_name)
+        for family in (netifaces.AF_INET, netifaces.AF_INET6):
+            for i in ifaddresses.get(family, []):
+                if i.get('addr'):
+                    # Link-local IPv6 addresses come with the '%<interface>' zone, unknown to `ip_address`
+                    addresses.add(ip_address(i['addr'].split('%')[0]))
+    return frozenset(addresses)
 
 
+@functools.lru_cache(maxsize=256)
 def _get_ip_from_address(address):
     """
     Extract an IP Address object from an address string.
@@ -66,6 +80,11 @@ def _get_ip_from_address(address):
     Returns:
         An IPv4Address or IPv6Address object.
     """
+    try:
+        # A bare or bracketed IP without port, as an IPv6 address contains colons itself
+        return ip_address(address.strip("[]"))
+    except ValueError:
+        pass
     ip, _, _ = address.rpartition(':')
     ip = ip or address  # If there was no separation, ip will be empty so use original string
     if ip == 'localhost':
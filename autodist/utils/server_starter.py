@@ -17,6 +17,7 @@
 import argparse
 import json
 import os
+import signal
 import subprocess
 
 from tensorflow.core.protobuf import config_pb2
@@ -27,22 +28,19 @@ from autodist.utils import logging
 
 
 def _clean_stale_servers():
-    # pylint: disable=anomalous-backslash-in-string
-    cmd = """ps aux | awk "/{}/ && !/ssh/ && ! /{}/ && ! /{}/" | awk "{{print \$2}}" | xargs kill -9"""  # noqa: W605
-    # Processes of | the local stale servers && excluding the current starter's pid && ppid | keep pids | kill them
-    cmd = cmd.format(
-        os.path.splitext(os.path.basename(__file__))[0],
-        os.getpid(),
-        os.getppid()
-    )
-    local_cmd = "bash -c '{}'".format(cmd)
-    logging.debug('>>> {}'.format(local_cmd))
-    try:
-        output = subprocess.check_output(local_cmd, shell=True, stderr=subprocess.STDOUT)
-        logging.debug('>>> {}'.format(output.decode('utf-8')))
-    except subprocess.CalledProcessError as e:
-        if e.returncode != 123:  # No stale process to kill
-            raise
+    # The interpreters running a server starter,
+    # which leaves out e.g. the ssh clients that the chief launches them with.
+    pattern = '^[^ ]*python[^ ]* .*{}'.format(os.path.splitext(os.path.basename(__file__))[0])
+    logging.debug('>>> pgrep -f {}'.format(pattern))
+    # `pgrep` rather than `pkill`, as this very process matches the pattern as well
+    output = subprocess.run(['pgrep', '-f', pattern], stdout=subprocess.PIPE, check=False).stdout
+    # Excluding the current starter's pid && ppid
+    for pid in set(map(int, output.split())) - {os.getpid(), os.getppid()}:
+        logging.debug('>>> kill -9 {}'.format(pid))
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:  # Already gone
+            pass
 
 
 def gen_server(cluster_spec, job_name: str, task_index: int, cpu_device_num: int):
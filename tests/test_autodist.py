@@ -17,4 +17,15 @@ def test_single_process(tmp_resource_spec):
     from autodist import AutoDist
     AutoDist(resource_spec_file=tmp_resource_spec)
     with pytest.raises(NotImplementedError):
-        AutoDist(resource_spec_file=tmp_resource_spec)
\ No newline at end of file
+        AutoDist(resource_spec_file=tmp_resource_spec)
+
+def test_tf_version_check():
+    from autodist import _parse_major_minor_version, _is_compatible_tf_version
+    assert _parse_major_minor_version('1.15.2') == (1, 15)
+    assert _parse_major_minor_version('2.2.0-rc1') == (2, 2)
+    assert _parse_major_minor_version('2.10.0') == (2, 10)
+    assert _is_compatible_tf_version((1, 15))
+    assert _is_compatible_tf_version((2, 1))
+    assert _is_compatible_tf_version((2, 2))
+    assert not _is_compatible_tf_version((1, 14))
+    assert not _is_compatible_tf_version((2, 10))
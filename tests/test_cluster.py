@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from autodist.cluster import Cluster
+from autodist.resource_spec import ResourceSpec
+
+
+class _Cluster(Cluster):
+    """A Cluster that cannot reach any remote, for testing the address bookkeeping only."""
+
+    def remote_exec(self, args, hostname):
+        raise NotImplementedError
+
+    def remote_file_write(self, remote_path, data, hostname):
+        raise NotImplementedError
+
+    def remote_copy(self, local_path, remote_path, hostname):
+        raise NotImplementedError
+
+
+def test_ipv6_addresses(monkeypatch, tmp_path):
+    monkeypatch.delenv('AUTODIST_WORKER', raising=False)
+    resource_file = tmp_path / 'resource_spec.yml'
+    resource_file.write_text(
+        'nodes:\n'
+        '  - address: fe80::1\n'
+        '    gpus: [0, 1]\n'
+        '    chief: true\n'
+        '  - address: 10.0.0.1\n'
+        '    gpus: [0]\n'
+        '    ssh_config: conf\n'
+    )
+    resource_spec = ResourceSpec(resource_file=str(resource_file))
+    assert resource_spec.nodes == {'fe80::1', '10.0.0.1'}
+    assert sorted(resource_spec.node_gpu_devices['fe80::1']) == ['fe80::1:GPU:0', 'fe80::1:GPU:1']
+    cluster = _Cluster(resource_spec)
+
+    for job_name, tasks in cluster.cluster_spec.items():
+        for task_index, full_address in enumerate(tasks):
+            ip, _, port = full_address.rpartition(':')
+            assert cluster.get_address_from_task(job_name, task_index) == ip
+            assert cluster._address_to_port[ip] == port
+    assert set(cluster._address_to_port) == resource_spec.nodes
+    assert cluster._cpu_devices == {'fe80::1': ['CPU:0'], '10.0.0.1': ['CPU:0']}
+    assert sorted(cluster._gpu_devices['fe80::1']) == ['GPU:0', 'GPU:1']
+
+    assert cluster.is_chief()
+    assert cluster.get_local_address() == 'fe80::1'
+    assert cluster.get_local_session_target() == 'grpc://localhost:' + cluster._address_to_port['fe80::1']
+    assert cluster.cluster_spec['worker'][cluster.get_local_worker_task_index()].startswith('fe80::1:')
+
+
+def test_local_worker_is_matched_exactly(monkeypatch):
+    # '2.0.0.1' is a substring of '12.0.0.1'
+    monkeypatch.setenv('AUTODIST_WORKER', '2.0.0.1')
+    resource_spec = SimpleNamespace(nodes={'12.0.0.1', '2.0.0.1'}, chief='12.0.0.1', cpu_devices=[], gpu_devices=[])
+    cluster = _Cluster(resource_spec)
+
+    assert not cluster.is_chief()
+    local_full_address = cluster.cluster_spec['worker'][cluster.get_local_worker_task_index()]
+    assert local_full_address == '2.0.0.1:' + cluster._address_to_port['2.0.0.1']
+    assert cluster.get_local_session_target() == 'grpc://localhost:' + local_full_address.rpartition(':')[2]
@@ -0,0 +1,29 @@
+from ipaddress import ip_address
+
+from autodist.utils.network import is_local_address, is_loopback_address, _get_ip_from_address, _local_addresses
+
+
+def test_loopback_address():
+    assert is_loopback_address('localhost')
+    assert is_loopback_address('127.0.0.1:15000')
+    assert not is_loopback_address('10.0.0.1')
+
+
+def test_local_address():
+    assert is_local_address('localhost')
+    assert is_local_address('127.0.0.1:15000')
+    assert not is_local_address('192.0.2.1')  # TEST-NET-1, never assigned to a host
+    assert not is_local_address('2001:db8::1')  # IPv6 documentation prefix, never assigned to a host
+    _local_addresses.cache_clear()
+    assert is_local_address('127.0.0.1')
+    assert _local_addresses.cache_info().misses == 1
+
+
+def test_get_ip_from_address():
+    assert _get_ip_from_address('10.0.0.1') == ip_address('10.0.0.1')
+    assert _get_ip_from_address('10.0.0.1:15000') == ip_address('10.0.0.1')
+    assert _get_ip_from_address('[::1]:15000') == ip_address('::1')
+    assert _get_ip_from_address('fe80::1') == ip_address('fe80::1')
+    assert _get_ip_from_address('[fe80::1]') == ip_address('fe80::1')
+    assert _get_ip_from_address('localhost') == ip_address('127.0.0.1')
+    assert _get_ip_from_address('10.0.0.1:15000') is _get_ip_from_address('10.0.0.1:15000')